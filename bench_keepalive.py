@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Compares requests per second with and without HTTP connection reuse.
+
+Starts APIHandler on a free local port and fires the same requests twice:
+once opening a new TCP connection per request, once over a single
+persistent connection. The API request uses an unknown action, so it
+exercises routing and JSON framing without touching the database.
+
+    python bench_keepalive.py [--requests 2000] [--latency-ms 0]
+"""
+import argparse
+import http.client
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from web_server import APIHandler
+
+class QuietHandler(APIHandler):
+    def log_message(self, format, *args):
+        pass
+
+def start_server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), QuietHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+def make_request(conn, kind):
+    if kind == "static":
+        conn.request("GET", "/")
+    else:
+        conn.request("POST", "/api", body=json.dumps({"action": "bench"}), headers={"Content-Type": "application/json"})
+    response = conn.getresponse()
+    response.read()
+    return response
+
+def run_case(port, kind, total, reuse, latency):
+    # http.client reconnects on its own when the server closes a persistent connection.
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    connections = 0
+    started = time.perf_counter()
+    for _ in range(total):
+        if not reuse: conn.close()
+        if conn.sock is None:
+            connections += 1
+            time.sleep(latency) # Extra round trip for the TCP handshake
+        time.sleep(latency)
+        make_request(conn, kind)
+    elapsed = time.perf_counter() - started
+    conn.close()
+    return total / elapsed, connections
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark keep-alive vs. new connection per request")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Simulated network round-trip time")
+    args = parser.parse_args()
+    latency = args.latency_ms / 1000
+
+    httpd = start_server()
+    port = httpd.server_address[1]
+    try:
+        print(f"{'request':<8} {'new conn/req':>14} {'keep-alive':>14} {'speedup':>8} {'connections':>12}")
+        for kind in ("static", "api"):
+            fresh, _ = run_case(port, kind, args.requests, False, latency)
+            reused, connections = run_case(port, kind, args.requests, True, latency)
+            print(f"{kind:<8} {fresh:>10.0f} r/s {reused:>10.0f} r/s {reused / fresh:>7.2f}x {connections:>12}")
+    finally:
+        httpd.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Shared database schema, migrations and bootstrap for the server and CLI scripts."""
+import sqlite3
+import hashlib
+import os
+
+DB_FILE = "database.db"
+ADMIN_USERNAME = "jeerawut"
+PBKDF2_ITERATIONS = 100000
+SESSION_TIMEOUT_SECONDS = 1800 # 30 minutes
+
+# Default admin credential: username 'jeerawut', password 'Jee@wut2534' (change it
+# after first login, or with reset_admin_password.py). The key is precomputed so
+# that bootstrapping a fresh database never runs the key derivation on startup:
+#   pbkdf2_hmac('sha256', b'Jee@wut2534', DEFAULT_ADMIN_SALT, DEFAULT_ADMIN_ITERATIONS)
+# If PBKDF2_ITERATIONS changes, regenerate DEFAULT_ADMIN_KEY with that command and
+# update DEFAULT_ADMIN_ITERATIONS, otherwise fresh installs could not log in as admin.
+DEFAULT_ADMIN_ITERATIONS = 100000
+DEFAULT_ADMIN_SALT = bytes.fromhex("72ffb23293b63bbe542bae83cb3f3c16")
+DEFAULT_ADMIN_KEY = bytes.fromhex("f56cc8503698142aec88f27ec0068f820581b5ddc90a91e98c93a1ec2be37e28")
+if DEFAULT_ADMIN_ITERATIONS != PBKDF2_ITERATIONS:
+    raise RuntimeError(f"DEFAULT_ADMIN_KEY was derived with {DEFAULT_ADMIN_ITERATIONS} PBKDF2 iterations "
+                       f"but PBKDF2_ITERATIONS is {PBKDF2_ITERATIONS}; regenerate the default admin key")
+
+# --- Connection & Security ---
+def get_db_connection(db_file=None):
+    conn = sqlite3.connect(db_file or DB_FILE)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def hash_password(password, salt=None):
+    """Hashes a password with a salt using PBKDF2-HMAC-SHA256."""
+    if salt is None: salt = os.urandom(16)
+    key = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, PBKDF2_ITERATIONS)
+    return salt, key
+
+# --- Migrations ---
+# Each migration upgrades the schema by exactly one version. The current
+# version is stored in PRAGMA user_version, so append new steps to the end
+# of MIGRATIONS and never edit one that has already shipped.
+def _migration_initial_schema(cursor):
+    cursor.execute('CREATE TABLE IF NOT EXISTS users (username TEXT PRIMARY KEY, salt BLOB NOT NULL, key BLOB NOT NULL, rank TEXT, first_name TEXT, last_name TEXT, position TEXT, department TEXT, role TEXT NOT NULL)')
+    cursor.execute('CREATE TABLE IF NOT EXISTS personnel (id TEXT PRIMARY KEY, rank TEXT, first_name TEXT, last_name TEXT, position TEXT, specialty TEXT, department TEXT)')
+    cursor.execute('CREATE TABLE IF NOT EXISTS status_reports (id TEXT PRIMARY KEY, date TEXT NOT NULL, submitted_by TEXT, department TEXT, timestamp DATETIME, report_data TEXT)')
+    cursor.execute('CREATE TABLE IF NOT EXISTS archived_reports (id TEXT PRIMARY KEY, year INTEGER NOT NULL, month INTEGER NOT NULL, date TEXT NOT NULL, department TEXT, submitted_by TEXT, report_data TEXT, timestamp DATETIME)')
+    cursor.execute('CREATE TABLE IF NOT EXISTS sessions (token TEXT PRIMARY KEY, username TEXT NOT NULL, created_at DATETIME DEFAULT CURRENT_TIMESTAMP, FOREIGN KEY (username) REFERENCES users (username) ON DELETE CASCADE)')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS persistent_statuses (
+            id TEXT PRIMARY KEY,
+            personnel_id TEXT NOT NULL,
+            department TEXT NOT NULL,
+            status TEXT,
+            details TEXT,
+            start_date TEXT,
+            end_date TEXT,
+            FOREIGN KEY (personnel_id) REFERENCES personnel (id) ON DELETE CASCADE
+        )
+    ''')
+
+    cursor.execute("SELECT username FROM users WHERE username = ?", (ADMIN_USERNAME,))
+    if not cursor.fetchone():
+        print(f"กำลังสร้างผู้ดูแลระบบ '{ADMIN_USERNAME}'...")
+        cursor.execute("INSERT INTO users (username, salt, key, rank, first_name, last_name, position, department, role) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                       (ADMIN_USERNAME, DEFAULT_ADMIN_SALT, DEFAULT_ADMIN_KEY, 'น.อ.', 'จีราวุฒิ', 'ผู้ดูแลระบบ', 'ผู้ดูแลระบบ', 'ส่วนกลาง', 'admin'))
+
+def _migration_data_epoch(cursor):
+    # Single-row counter that writers outside the server bump, see bump_data_epoch().
+    cursor.execute('CREATE TABLE IF NOT EXISTS data_epoch (id INTEGER PRIMARY KEY CHECK (id = 1), value INTEGER NOT NULL)')
+    cursor.execute('INSERT OR IGNORE INTO data_epoch (id, value) VALUES (1, 0)')
+
+MIGRATIONS = [
+    _migration_initial_schema,
+    _migration_data_epoch,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def get_data_epoch(conn):
+    return conn.execute("SELECT value FROM data_epoch WHERE id = 1").fetchone()[0]
+
+def bump_data_epoch(conn):
+    """Tells a running server that data changed outside it, so its response cache is dropped.
+
+    Call it inside the same transaction as the write, from any process other than web_server.py.
+    """
+    conn.execute("UPDATE data_epoch SET value = value + 1 WHERE id = 1")
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn):
+    """Applies pending migrations, each in its own transaction. Returns the list of versions applied."""
+    applied = []
+    if get_schema_version(conn) >= SCHEMA_VERSION: return applied
+    cursor = conn.cursor()
+    while True:
+        # Take the write lock first and re-read the version, so a second process
+        # starting at the same time waits and then skips steps already applied.
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            version = get_schema_version(conn)
+            if version >= SCHEMA_VERSION:
+                conn.rollback()
+                return applied
+            MIGRATIONS[version](cursor)
+            cursor.execute(f"PRAGMA user_version = {version + 1}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version + 1)
+
+def init_db(db_file=None):
+    """Brings the database up to SCHEMA_VERSION. A current schema costs a single PRAGMA read."""
+    conn = get_db_connection(db_file)
+    try:
+        applied = migrate(conn)
+    finally:
+        conn.close()
+    if applied:
+        print(f"ปรับปรุงโครงสร้างฐานข้อมูลเป็นเวอร์ชัน {applied[-1]} แล้ว")
+    print("ฐานข้อมูล SQLite พร้อมใช้งาน")
+    return applied
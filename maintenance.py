@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Database housekeeping that can run while the web server is live.
+
+Deletes happen in small transactions with a short pause between them, so the
+write lock is never held for long and API requests can interleave. Examples:
+
+    python maintenance.py purge --archives-older-than 2 --expired-statuses
+    python maintenance.py clear-all --yes --chunk-size 100
+    python maintenance.py vacuum --enable-incremental
+
+Space is only returned to the filesystem once the file is in incremental
+auto_vacuum mode. Switching to that mode needs one full VACUUM, which rewrites
+the whole file under an exclusive lock. That step only runs when asked for
+with vacuum --enable-incremental, so schedule it outside duty hours.
+"""
+import argparse
+import os
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+from database import DB_FILE, SESSION_TIMEOUT_SECONDS, bump_data_epoch, get_db_connection, init_db
+
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_PAUSE_SECONDS = 0.05
+BUSY_TIMEOUT_MS = 10000
+VACUUM_PAGES_PER_STEP = 256
+
+# --- Helpers ---
+def open_connection(db_file):
+    conn = get_db_connection(db_file)
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    return conn
+
+def get_file_stats(conn):
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    freelist_count = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return {"size": page_size * page_count, "free": page_size * freelist_count, "page_size": page_size}
+
+def years_ago(today, years):
+    try:
+        return today.replace(year=today.year - years)
+    except ValueError: # 29 Feb
+        return today.replace(year=today.year - years, day=28)
+
+def positive_int(value):
+    number = int(value)
+    if number < 1: raise argparse.ArgumentTypeError(f"ต้องเป็นจำนวนเต็มตั้งแต่ 1 ขึ้นไป: {value}")
+    return number
+
+def non_negative_float(value):
+    number = float(value)
+    if number < 0: raise argparse.ArgumentTypeError(f"ต้องไม่ติดลบ: {value}")
+    return number
+
+def format_bytes(num_bytes):
+    for unit in ("B", "KB", "MB"):
+        if abs(num_bytes) < 1024: return f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} GB"
+
+def delete_in_chunks(conn, table, where="1 = 1", params=(), chunk_size=DEFAULT_CHUNK_SIZE, pause=DEFAULT_PAUSE_SECONDS):
+    """Deletes matching rows chunk_size at a time, committing and sleeping between chunks. Returns the row count."""
+    query = f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} WHERE {where} LIMIT ?)"
+    total = 0
+    while True:
+        cursor = conn.execute(query, (*params, chunk_size))
+        deleted = cursor.rowcount
+        if deleted > 0: bump_data_epoch(conn) # Drops the live server's cached responses
+        conn.commit()
+        if deleted <= 0: break
+        total += deleted
+        print(f"  {table}: ลบแล้ว {total} แถว", end="\r", flush=True)
+        if deleted < chunk_size: break
+        time.sleep(pause)
+    print(f"  {table}: ลบทั้งหมด {total} แถว")
+    return total
+
+def reclaim_space(conn, enable_incremental=False):
+    """Returns free pages to the filesystem and refreshes planner statistics.
+
+    A full VACUUM only runs when enable_incremental is set; otherwise a file not
+    yet in incremental mode just gets ANALYZE.
+    """
+    before = get_file_stats(conn)
+    auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    if auto_vacuum != 2 and enable_incremental:
+        print("กำลังเปิดใช้ incremental auto_vacuum (VACUUM ทั้งไฟล์ ระหว่างนี้ระบบจะเขียนข้อมูลไม่ได้)...")
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    elif auto_vacuum != 2:
+        print(f"ยังไม่ได้เปิดใช้ incremental auto_vacuum: พื้นที่ว่าง {format_bytes(before['free'])} จะยังไม่คืนให้ระบบไฟล์")
+        print("  รัน 'python maintenance.py vacuum --enable-incremental' นอกเวลาใช้งานเพื่อแปลงไฟล์ (ทำครั้งเดียว)")
+    else:
+        while conn.execute("PRAGMA freelist_count").fetchone()[0] > 0:
+            conn.execute(f"PRAGMA incremental_vacuum({VACUUM_PAGES_PER_STEP})").fetchall()
+            conn.commit()
+            time.sleep(DEFAULT_PAUSE_SECONDS)
+    conn.execute("ANALYZE")
+    conn.commit()
+    after = get_file_stats(conn)
+    print(f"ขนาดไฟล์: {format_bytes(before['size'])} -> {format_bytes(after['size'])} (คืนพื้นที่ {format_bytes(before['size'] - after['size'])})")
+
+# --- Commands ---
+def purge(conn, args):
+    total = 0
+    if args.archives_older_than is not None:
+        cutoff = years_ago(date.today(), args.archives_older_than).isoformat()
+        print(f"ลบรายงานที่เก็บถาวรก่อนวันที่ {cutoff}...")
+        total += delete_in_chunks(conn, "archived_reports", "date < ?", (cutoff,), args.chunk_size, args.pause)
+    if args.expired_statuses:
+        print("ลบสถานะที่สิ้นสุดแล้ว...")
+        total += delete_in_chunks(conn, "persistent_statuses", "end_date < ?", (date.today().isoformat(),), args.chunk_size, args.pause)
+    if args.expired_sessions:
+        print("ลบ session ที่หมดอายุ...")
+        expiry_limit = datetime.now() - timedelta(seconds=SESSION_TIMEOUT_SECONDS)
+        total += delete_in_chunks(conn, "sessions", "created_at < ?", (expiry_limit,), args.chunk_size, args.pause)
+    return total
+
+def clear_all(conn, args):
+    total = 0
+    for table in ("status_reports", "archived_reports", "persistent_statuses"):
+        print(f"กำลังลบข้อมูลจากตาราง {table}...")
+        total += delete_in_chunks(conn, table, chunk_size=args.chunk_size, pause=args.pause)
+    return total
+
+def build_parser():
+    # Shared by every subcommand so the options can follow it, e.g. "purge ... --chunk-size 100".
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--db", default=DB_FILE, help=f"ไฟล์ฐานข้อมูล (ค่าเริ่มต้น: {DB_FILE})")
+    common.add_argument("--chunk-size", type=positive_int, default=DEFAULT_CHUNK_SIZE, help="จำนวนแถวที่ลบต่อหนึ่ง transaction")
+    common.add_argument("--pause", type=non_negative_float, default=DEFAULT_PAUSE_SECONDS, help="เวลาพัก (วินาที) ระหว่างแต่ละ transaction")
+    common.add_argument("--no-vacuum", action="store_true", help="ไม่ต้องคืนพื้นที่ไฟล์หลังลบข้อมูล")
+
+    parser = argparse.ArgumentParser(description="งานบำรุงรักษาฐานข้อมูลระบบส่งยอดกำลังพล")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    purge_parser = subparsers.add_parser("purge", parents=[common], help="ลบข้อมูลเก่าตามนโยบายการเก็บรักษา")
+    purge_parser.add_argument("--archives-older-than", type=positive_int, metavar="YEARS", help="ลบรายงานที่เก็บถาวรที่เก่ากว่า N ปี")
+    purge_parser.add_argument("--expired-statuses", action="store_true", help="ลบสถานะที่วันสิ้นสุดผ่านไปแล้ว")
+    purge_parser.add_argument("--expired-sessions", action="store_true", help="ลบ session ที่หมดอายุ")
+    purge_parser.set_defaults(func=purge)
+
+    clear_parser = subparsers.add_parser("clear-all", parents=[common], help="ลบประวัติการส่งรายงานทั้งหมด")
+    clear_parser.add_argument("--yes", action="store_true", help="ไม่ต้องถามยืนยัน")
+    clear_parser.set_defaults(func=clear_all)
+
+    vacuum_parser = subparsers.add_parser("vacuum", parents=[common], help="คืนพื้นที่ว่างและปรับปรุงสถิติ (ANALYZE) เท่านั้น")
+    vacuum_parser.add_argument("--enable-incremental", action="store_true",
+                               help="แปลงไฟล์เป็น incremental auto_vacuum ด้วย VACUUM ทั้งไฟล์ (ล็อกฐานข้อมูลตลอดการทำงาน ทำครั้งเดียว)")
+    vacuum_parser.set_defaults(func=None)
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "purge" and args.archives_older_than is None and not args.expired_statuses and not args.expired_sessions:
+        parser.error("กรุณาระบุนโยบายอย่างน้อยหนึ่งข้อ เช่น --archives-older-than หรือ --expired-statuses")
+    if not os.path.exists(args.db):
+        print(f"ข้อผิดพลาด: ไม่พบไฟล์ฐานข้อมูล '{args.db}'")
+        return 1
+    if args.command == "clear-all" and not args.yes:
+        confirm = input("คุณแน่ใจหรือไม่ว่าต้องการลบประวัติการส่งรายงานทั้งหมด? การกระทำนี้ไม่สามารถย้อนกลับได้ (พิมพ์ 'yes' เพื่อยืนยัน): ")
+        if confirm.lower() != 'yes':
+            print("ยกเลิกการลบข้อมูล")
+            return 0
+
+    init_db(args.db)
+    conn = open_connection(args.db)
+    started = time.perf_counter()
+    try:
+        deleted = args.func(conn, args) if args.func else 0
+        if args.func: print(f"\nลบข้อมูลทั้งหมด {deleted} แถว")
+        if args.command == "vacuum" or (deleted and not args.no_vacuum):
+            reclaim_space(conn, enable_incremental=getattr(args, "enable_incremental", False))
+    except sqlite3.Error as e:
+        print(f"เกิดข้อผิดพลาดในการเชื่อมต่อฐานข้อมูล: {e}")
+        return 1
+    finally:
+        conn.close()
+    print(f"เสร็จสิ้นใน {time.perf_counter() - started:.2f} วินาที")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
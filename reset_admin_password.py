@@ -1,17 +1,6 @@
 import sqlite3
-import hashlib
-import os
 import getpass
-
-DB_FILE = "database.db"
-ADMIN_USERNAME = "jeerawut"
-
-def hash_password(password, salt=None):
-    """Hashes a password with a salt using PBKDF2-HMAC-SHA256."""
-    if salt is None:
-        salt = os.urandom(16)
-    key = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, 100000)
-    return salt, key
+from database import get_db_connection, bump_data_epoch, init_db, hash_password, ADMIN_USERNAME
 
 def reset_admin_password():
     """Resets the password for the admin user."""
@@ -32,9 +21,11 @@ def reset_admin_password():
     # ทำการ Hash รหัสผ่านใหม่
     new_salt, new_key = hash_password(new_password)
 
+    conn = None
     try:
         # เชื่อมต่อฐานข้อมูลและอัปเดต
-        conn = sqlite3.connect(DB_FILE)
+        init_db() # Makes sure the data_epoch table exists
+        conn = get_db_connection()
         cursor = conn.cursor()
 
         cursor.execute("UPDATE users SET salt = ?, key = ? WHERE username = ?", (new_salt, new_key, ADMIN_USERNAME))
@@ -42,6 +33,7 @@ def reset_admin_password():
         if cursor.rowcount == 0:
             print(f"\nไม่พบผู้ใช้ชื่อ '{ADMIN_USERNAME}' ในฐานข้อมูล!")
         else:
+            bump_data_epoch(conn)
             conn.commit()
             print(f"\nรีเซ็ตรหัสผ่านสำหรับ '{ADMIN_USERNAME}' สำเร็จแล้ว!")
 
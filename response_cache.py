@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+In-memory cache of serialized API responses, scoped by role/department and
+invalidated per table.
+
+Read actions opt in through a "cache" entry in APIHandler.ACTION_MAP, e.g.
+{"scope": "department", "tables": ("personnel",)}, and write actions list the
+tables they modify under "writes". Scripts that write from another process
+(maintenance.py, reset_admin_password.py) bump the data_epoch row instead; every
+lookup passes the current epoch, and a change drops the whole cache. Edits made
+by hand with the sqlite3 shell bump nothing and only expire with the TTL.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+def scope_key(scope, session):
+    session = session or {}
+    if scope == "global": return ()
+    if scope == "department": return (session.get("role"), session.get("department"))
+    if scope == "user": return (session.get("username"),)
+    raise ValueError(f"Unknown cache scope: {scope}")
+
+class ResponseCache:
+    def __init__(self, max_entries=256, ttl_seconds=300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict() # key -> (body, tables, stored_at)
+        self._data_epoch = None # data_epoch value the cached entries were computed under
+        self._generations = {} # table -> write counter, guards against storing results computed before a write
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def make_key(self, action, scope, session, payload):
+        # Results also depend on today's date (active statuses, weekly range), so it is part of every key.
+        return (action, scope_key(scope, session), date.today().isoformat(), json.dumps(payload, sort_keys=True))
+
+    def _sync_epoch(self, data_epoch):
+        if data_epoch != self._data_epoch:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._data_epoch = data_epoch
+
+    def get(self, key, data_epoch):
+        with self._lock:
+            self._sync_epoch(data_epoch)
+            entry = self._entries.get(key)
+            if entry and time.monotonic() - entry[2] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry: del self._entries[key]
+            self.misses += 1
+            return None
+
+    def snapshot(self, tables):
+        with self._lock:
+            return tuple(self._generations.get(t, 0) for t in tables)
+
+    def put(self, key, tables, snapshot, data_epoch, body):
+        """Stores body unless one of its tables was written, here or by another process, since snapshot was taken."""
+        with self._lock:
+            if data_epoch != self._data_epoch: return
+            if snapshot != tuple(self._generations.get(t, 0) for t in tables): return
+            self._entries[key] = (body, frozenset(tables), time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, tables):
+        tables = set(tables)
+        with self._lock:
+            for t in tables: self._generations[t] = self._generations.get(t, 0) + 1
+            stale = [k for k, (_, deps, _) in self._entries.items() if deps & tables]
+            for k in stale: del self._entries[k]
+            self.invalidations += len(stale)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries), "max_entries": self.max_entries, "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits, "misses": self.misses, "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions, "invalidations": self.invalidations,
+            }